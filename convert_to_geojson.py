@@ -1,110 +1,103 @@
-import os
-import json
 import argparse
-import sys
 
-def process_json_file(input_path, output_path):
-    """
-    Reads a JSON file in the specified format, extracts track data and metadata,
-    and writes it to a new GeoJSON file.
+import geojson_io
 
-    Args:
-        input_path (str): The full path to the input JSON file.
-        output_path (str): The full path for the output GeoJSON file.
-    
-    Returns:
-        bool: True if conversion was successful, False otherwise.
+# Every track feature sits in a "features" array, so a file without that token
+# (e.g. one holding only metadata and no items) is skipped without being parsed,
+# so a corrupt file without it is reported as having no features, not as invalid JSON.
+_MARKER = b'"features"'
+_LABEL = "track features"
+
+
+def _iter_track_features(items, input_path, summaries=None, report=print):
     """
-    try:
-        with open(input_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except json.JSONDecodeError:
-        print(f"Error: Invalid JSON in file {input_path}")
-        return False
-    except FileNotFoundError:
-        print(f"Error: Input file not found at {input_path}")
-        return False
-
-    # The final GeoJSON will be a FeatureCollection containing all tracks from the file.
-    final_features = []
-
-    # The top-level key is "items", which is a list.
-    # Using .get() is safer than direct access in case the key is missing.
-    items = data.get("items", [])
-    if not isinstance(items, list):
-        print(f"Warning: 'items' key in {input_path} is not a list. Skipping file.")
-        return False
+    Yields every track feature in the "items" list, with its properties
+    enriched by the user and track metadata.
 
+    If a `summaries` dict is given, each track's summary is moved into it,
+    keyed by track ID, and the feature only carries a "summaryRef" to it.
+    Warnings are passed to `report`.
+    """
     for item in items:
+        if not isinstance(item, dict):
+            report(f"Warning: Invalid entry in 'items' of {input_path}. Skipping entry.")
+            continue
         # Each item has user metadata and a list of tracks.
-        user_id = item.get("userId")
-        user_properties = {
-            "userId": user_id,
-            "ageGroup": item.get("ageGroup"),
-            "countryCode": item.get("countryCode"),
-            "gender": item.get("gender")
-        }
+        user_properties = geojson_io.user_properties(item)
+        user_id = user_properties["userId"]
 
         tracks = item.get("tracks", [])
         if not isinstance(tracks, list):
-            print(f"Warning: 'tracks' key for user {user_id} in {input_path} is not a list. Skipping user.")
+            report(f"Warning: 'tracks' key for user {user_id} in {input_path} is not a list. Skipping user.")
             continue
 
         for track_item in tracks:
+            if not isinstance(track_item, dict):
+                report(f"Warning: Invalid track entry for user {user_id} in {input_path}. Skipping track.")
+                continue
+            tg = track_item.get
             # The actual geometry is inside track_item["track"]["features"]
             # It's already in GeoJSON Feature format, which is very convenient.
-            inner_feature_collection = track_item.get("track")
-            if not inner_feature_collection or 'features' not in inner_feature_collection:
-                print(f"Warning: No 'track' or 'features' found for a track by user {user_id} in {input_path}. Skipping track.")
+            inner_feature_collection = tg("track")
+            if not isinstance(inner_feature_collection, dict) or 'features' not in inner_feature_collection:
+                report(f"Warning: No 'track' or 'features' found for a track by user {user_id} in {input_path}. Skipping track.")
                 continue
+
+            # Track-specific properties are the same for every feature of this track, so build them once.
+            # Summary and resort info are kept as nested objects for better organization.
+            track_properties = {
+                "trackId": tg("trackId"),
+                "activity": tg("activity"),
+                "locationCountry": tg("locationCountry"),
+                "summary": tg("summary"),
+                "resort": tg("resort")
+            }
+            summary_ref, summary = geojson_io.split_summary(track_properties, summaries)
             
             # This is the list of features (likely just one LineString) for this specific track.
-            for feature in inner_feature_collection.get("features", []):
+            features = inner_feature_collection.get("features") or []
+            if not isinstance(features, list):
+                report(f"Warning: 'features' for a track by user {user_id} in {input_path} is not a list. Skipping track.")
+                continue
+            for feature in features:
+                if not isinstance(feature, dict):
+                    continue
+                properties = feature.get("properties") or {}
+                if not isinstance(properties, dict):
+                    report(f"Warning: Invalid 'properties' in a feature by user {user_id} in {input_path}. Skipping feature.")
+                    continue
                 # We will enrich the feature's properties with all the metadata.
-                # Start with any existing properties the feature might have.
-                new_properties = feature.get("properties", {}).copy()
-
-                # Add user properties
-                new_properties.update(user_properties)
-
-                # Add track-specific properties
-                new_properties["trackId"] = track_item.get("trackId")
-                new_properties["activity"] = track_item.get("activity")
-                new_properties["locationCountry"] = track_item.get("locationCountry")
-                
-                # Add summary and resort info as nested objects for better organization
-                new_properties["summary"] = track_item.get("summary")
-                new_properties["resort"] = track_item.get("resort")
-
-                # Update the feature with the new, enriched properties
-                feature["properties"] = new_properties
-                
-                # Add the fully processed feature to our final list
-                final_features.append(feature)
-
-    if not final_features:
-        print(f"Info: No valid track features found in {input_path}. No output file will be created.")
-        return False
-
-    # Create the final GeoJSON FeatureCollection structure
-    output_geojson = {
-        "type": "FeatureCollection",
-        "features": final_features
-    }
-
-    # Write the beautiful, new GeoJSON file
-    try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            # Use indent for human-readable output
-            json.dump(output_geojson, f, indent=2)
-    except IOError as e:
-        print(f"Error: Could not write to output file {output_path}. Reason: {e}")
-        return False
-        
-    return True
-
-
-def convert_directory_to_geojson(input_dir, output_dir):
+                # Start with any existing properties the feature might have, then
+                # add the user and track properties on top in a single merge.
+                feature["properties"] = {**properties, **user_properties, **track_properties}
+
+                if summary_ref is not None:
+                    geojson_io.add_summary(summaries, summary_ref, summary, input_path, report)
+
+                yield feature
+
+
+def process_json_file(input_path, output_path, pretty=False, ndjson=False, summary_refs=False):
+    """
+    Reads a JSON file in the specified format, extracts track data and metadata,
+    and writes it to a new GeoJSON file.
+
+    Args:
+        input_path (str): The full path to the input JSON file.
+        output_path (str): The full path for the output GeoJSON file.
+        pretty (bool): Write indented, human-readable JSON instead of compact JSON.
+        ndjson (bool): Write newline-delimited GeoJSON, one feature per line.
+        summary_refs (bool): Write each track summary once in a top-level "summaries"
+            map and reference it from the features. Not supported with `ndjson`.
+    
+    Returns:
+        bool: True if conversion was successful, False otherwise.
+    """
+    return geojson_io.convert_file(input_path, output_path, _iter_track_features, _MARKER, _LABEL,
+                                   pretty, ndjson, summary_refs)
+
+
+def convert_directory_to_geojson(input_dir, output_dir, workers=None, pretty=False, combine=False, ndjson=False, summary_refs=False):
     """
     Finds all .json files in an input directory, converts them to GeoJSON,
     and saves them in the output directory.
@@ -112,40 +105,14 @@ def convert_directory_to_geojson(input_dir, output_dir):
     Args:
         input_dir (str): Path to the directory containing source JSON files.
         output_dir (str): Path to the directory where GeoJSON files will be saved.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        pretty (bool): Write indented, human-readable JSON instead of compact JSON.
+        combine (bool): Write all features into one 'combined.geojson' file.
+        ndjson (bool): Write newline-delimited GeoJSON to '.geojsonl' files.
+        summary_refs (bool): Write track summaries once in a top-level "summaries" map.
     """
-    if not os.path.isdir(input_dir):
-        print(f"Error: Input directory '{input_dir}' not found.")
-        sys.exit(1)
-
-    # Create the output directory if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
-    print(f"Output will be saved in: {os.path.abspath(output_dir)}")
-
-    file_count = 0
-    success_count = 0
-
-    for filename in os.listdir(input_dir):
-        if filename.lower().endswith(".json"):
-            file_count += 1
-            input_filepath = os.path.join(input_dir, filename)
-            
-            # Create a corresponding output filename
-            base_name = os.path.splitext(filename)[0]
-            output_filename = f"{base_name}.geojson"
-            output_filepath = os.path.join(output_dir, output_filename)
-
-            print(f"\nProcessing '{filename}'...")
-            if process_json_file(input_filepath, output_filepath):
-                print(f"Successfully converted to '{output_filename}'")
-                success_count += 1
-            else:
-                print(f"Failed to convert '{filename}'")
-
-    print("\n--- Conversion Summary ---")
-    print(f"Total .json files found: {file_count}")
-    print(f"Successfully converted: {success_count}")
-    print(f"Failed or skipped: {file_count - success_count}")
-    print("--------------------------")
+    geojson_io.convert_directory(input_dir, output_dir, _iter_track_features, _MARKER, _LABEL, ".geojson",
+                                 workers, pretty, combine, ndjson, summary_refs)
 
 
 def main():
@@ -163,10 +130,12 @@ def main():
         default="geojson_output",
         help="The path to the directory where GeoJSON files will be saved.\n(default: 'geojson_output' in the current directory)"
     )
+    geojson_io.add_output_arguments(parser, "combined.geojson")
 
     args = parser.parse_args()
+    geojson_io.check_output_arguments(parser, args)
     
-    convert_directory_to_geojson(args.input_dir, args.output_dir)
+    convert_directory_to_geojson(args.input_dir, args.output_dir, args.workers, args.pretty, args.combine, args.ndjson, args.summary_refs)
 
 
 if __name__ == "__main__":
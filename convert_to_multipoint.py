@@ -1,79 +1,82 @@
-import os
-import json
 import argparse
-import sys
 
-def process_json_file(input_path, output_path):
-    """
-    Reads a JSON file, finds all LineString tracks, and converts each
-    one into a MultiPoint feature in a single output GeoJSON file.
+import geojson_io
 
-    Args:
-        input_path (str): The full path to the input JSON file.
-        output_path (str): The full path for the output GeoJSON file.
-    
-    Returns:
-        bool: True if conversion was successful, False otherwise.
+# Files without a single "LineString" token have nothing to convert, so skip them unparsed.
+# A corrupt file without it is reported as having no features, not as invalid JSON.
+_MARKER = b'"LineString"'
+_LABEL = "LineString features"
+
+
+def _iter_multipoint_features(items, input_path, summaries=None, report=print):
     """
-    try:
-        with open(input_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except json.JSONDecodeError:
-        print(f"Error: Invalid JSON in file {input_path}")
-        return False
-    except FileNotFoundError:
-        print(f"Error: Input file not found at {input_path}")
-        return False
-
-    # This list will hold all the new MultiPoint features.
-    all_multipoint_features = []
-
-    items = data.get("items", [])
-    if not isinstance(items, list):
-        print(f"Warning: 'items' key in {input_path} is not a list. Skipping file.")
-        return False
+    Yields a MultiPoint feature for every LineString track in the "items"
+    list, carrying the user and track metadata as properties.
 
+    If a `summaries` dict is given, each track's summary is moved into it,
+    keyed by track ID, and the feature only carries a "summaryRef" to it.
+    Warnings are passed to `report`.
+    """
     for item in items:
-        user_id = item.get("userId")
-        user_properties = {
-            "userId": user_id,
-            "ageGroup": item.get("ageGroup"),
-            "countryCode": item.get("countryCode"),
-            "gender": item.get("gender")
-        }
+        if not isinstance(item, dict):
+            report(f"Warning: Invalid entry in 'items' of {input_path}. Skipping entry.")
+            continue
+        user_properties = geojson_io.user_properties(item)
+        user_id = user_properties["userId"]
 
         tracks = item.get("tracks", [])
         if not isinstance(tracks, list):
-            print(f"Warning: 'tracks' key for user {user_id} in {input_path} is not a list. Skipping user.")
+            report(f"Warning: 'tracks' key for user {user_id} in {input_path} is not a list. Skipping user.")
             continue
 
         for track_item in tracks:
-            inner_feature_collection = track_item.get("track")
-            if not inner_feature_collection or 'features' not in inner_feature_collection:
-                print(f"Warning: No 'track' or 'features' found for a track by user {user_id}. Skipping.")
+            if not isinstance(track_item, dict):
+                report(f"Warning: Invalid track entry for user {user_id} in {input_path}. Skipping track.")
+                continue
+            tg = track_item.get
+            inner_feature_collection = tg("track")
+            if not isinstance(inner_feature_collection, dict) or 'features' not in inner_feature_collection:
+                report(f"Warning: No 'track' or 'features' found for a track by user {user_id}. Skipping.")
                 continue
+
+            # Track metadata is the same for every feature of this track, so build it once.
+            track_metadata = {
+                "trackId": tg("trackId"),
+                "activity": tg("activity"),
+                "locationCountry": tg("locationCountry"),
+                "summary": tg("summary"),
+                "resort": tg("resort")
+            }
+            summary_ref, summary = geojson_io.split_summary(track_metadata, summaries)
             
             # This is the list of features (likely one LineString) for this track.
-            for feature in inner_feature_collection.get("features", []):
+            features = inner_feature_collection.get("features") or []
+            if not isinstance(features, list):
+                report(f"Warning: 'features' for a track by user {user_id} in {input_path} is not a list. Skipping track.")
+                continue
+            for feature in features:
+                if not isinstance(feature, dict):
+                    continue
                 # We only care about converting LineStrings
-                if feature.get("geometry", {}).get("type") != "LineString":
+                geometry = feature.get("geometry")
+                if not isinstance(geometry, dict) or geometry.get("type") != "LineString":
+                    continue
+                properties = feature.get("properties") or {}
+                if not isinstance(properties, dict):
+                    report(f"Warning: Invalid 'properties' in a feature by user {user_id} in {input_path}. Skipping feature.")
                     continue
                 
                 # --- 1. Assemble all properties for the track ---
                 # These properties will be applied to the new MultiPoint feature.
-                track_properties = feature.get("properties", {}).copy()
-                track_properties.update(user_properties)
-                track_properties["trackId"] = track_item.get("trackId")
-                track_properties["activity"] = track_item.get("activity")
-                track_properties["locationCountry"] = track_item.get("locationCountry")
-                track_properties["summary"] = track_item.get("summary")
-                track_properties["resort"] = track_item.get("resort")
+                # A single merge; later keys win, as with the previous copy() + update().
+                track_properties = {**properties, **user_properties, **track_metadata}
 
                 # --- 2. Create the new MultiPoint geometry ---
-                # The coordinate array from a LineString is exactly what a MultiPoint needs.
+                # The coordinate array from a LineString is exactly what a MultiPoint needs,
+                # so the parsed list is reused as-is; the serializer writes it without a copy.
                 multipoint_geometry = {
                     "type": "MultiPoint",
-                    "coordinates": feature["geometry"].get("coordinates", [])
+                    "coordinates": geometry.get("coordinates", [])
                 }
 
                 # --- 3. Create the new MultiPoint Feature ---
@@ -82,67 +85,49 @@ def process_json_file(input_path, output_path):
                     "geometry": multipoint_geometry,
                     "properties": track_properties
                 }
-                
-                all_multipoint_features.append(multipoint_feature)
-
-    if not all_multipoint_features:
-        print(f"Info: No valid LineString features found in {input_path} to convert. No output file created.")
-        return False
-
-    # Create the final GeoJSON FeatureCollection structure
-    output_geojson = {
-        "type": "FeatureCollection",
-        "features": all_multipoint_features
-    }
-
-    # Write the new GeoJSON file
-    try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(output_geojson, f, indent=2)
-    except IOError as e:
-        print(f"Error: Could not write to output file {output_path}. Reason: {e}")
-        return False
-        
-    return True
-
-
-def convert_directory_to_multipoint(input_dir, output_dir):
-    """
-    Finds all .json files in a directory, converts their LineStrings to
-    MultiPoints, and saves them as new GeoJSON files.
-    """
-    if not os.path.isdir(input_dir):
-        print(f"Error: Input directory '{input_dir}' not found.")
-        sys.exit(1)
 
-    os.makedirs(output_dir, exist_ok=True)
-    print(f"Output will be saved in: {os.path.abspath(output_dir)}")
+                if summary_ref is not None:
+                    geojson_io.add_summary(summaries, summary_ref, summary, input_path, report)
 
-    file_count = 0
-    success_count = 0
+                yield multipoint_feature
 
-    for filename in os.listdir(input_dir):
-        if filename.lower().endswith(".json"):
-            file_count += 1
-            input_filepath = os.path.join(input_dir, filename)
-            
-            # Create a corresponding output filename
-            base_name = os.path.splitext(filename)[0]
-            output_filename = f"{base_name}_multipoint.geojson"
-            output_filepath = os.path.join(output_dir, output_filename)
 
-            print(f"\nProcessing '{filename}'...")
-            if process_json_file(input_filepath, output_filepath):
-                print(f"Successfully converted to '{output_filename}'")
-                success_count += 1
-            else:
-                print(f"Failed to convert '{filename}'")
+def process_json_file(input_path, output_path, pretty=False, ndjson=False, summary_refs=False):
+    """
+    Reads a JSON file, finds all LineString tracks, and converts each
+    one into a MultiPoint feature in a single output GeoJSON file.
 
-    print("\n--- Conversion Summary ---")
-    print(f"Total .json files found: {file_count}")
-    print(f"Successfully converted: {success_count}")
-    print(f"Failed or skipped: {file_count - success_count}")
-    print("--------------------------")
+    Args:
+        input_path (str): The full path to the input JSON file.
+        output_path (str): The full path for the output GeoJSON file.
+        pretty (bool): Write indented, human-readable JSON instead of compact JSON.
+        ndjson (bool): Write newline-delimited GeoJSON, one feature per line.
+        summary_refs (bool): Write each track summary once in a top-level "summaries"
+            map and reference it from the features. Not supported with `ndjson`.
+    
+    Returns:
+        bool: True if conversion was successful, False otherwise.
+    """
+    return geojson_io.convert_file(input_path, output_path, _iter_multipoint_features, _MARKER, _LABEL,
+                                   pretty, ndjson, summary_refs)
+
+
+def convert_directory_to_multipoint(input_dir, output_dir, workers=None, pretty=False, combine=False, ndjson=False, summary_refs=False):
+    """
+    Finds all .json files in a directory, converts their LineStrings to
+    MultiPoints, and saves them as new GeoJSON files.
+
+    Args:
+        input_dir (str): Path to the directory containing source JSON files.
+        output_dir (str): Path to the directory where GeoJSON files will be saved.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        pretty (bool): Write indented, human-readable JSON instead of compact JSON.
+        combine (bool): Write all features into one 'combined_multipoint.geojson' file.
+        ndjson (bool): Write newline-delimited GeoJSON to '.geojsonl' files.
+        summary_refs (bool): Write track summaries once in a top-level "summaries" map.
+    """
+    geojson_io.convert_directory(input_dir, output_dir, _iter_multipoint_features, _MARKER, _LABEL, "_multipoint.geojson",
+                                 workers, pretty, combine, ndjson, summary_refs)
 
 
 def main():
@@ -160,9 +145,12 @@ def main():
         default="geojson_output",
         help="The path to the directory where GeoJSON files will be saved.\n(default: 'geojson_output' in the current directory)"
     )
+    geojson_io.add_output_arguments(parser, "combined_multipoint.geojson")
 
     args = parser.parse_args()
-    convert_directory_to_multipoint(args.input_dir, args.output_dir)
+    geojson_io.check_output_arguments(parser, args)
+    
+    convert_directory_to_multipoint(args.input_dir, args.output_dir, args.workers, args.pretty, args.combine, args.ndjson, args.summary_refs)
 
 
 if __name__ == "__main__":
@@ -10,6 +10,8 @@ style saving method, and the correct 'PIXEL_SIZE' parameter for QGIS 3.34.
 import os
 import sys
 import argparse
+import tempfile
+from xml.sax.saxutils import escape
 
 # --- QGIS INSTALLATION PATH (IMPORTANT FOR STANDALONE EXECUTION) ---
 QGIS_INSTALL_PATH = r'C:\OSGeo4W\apps\qgis'
@@ -18,23 +20,19 @@ QGIS_INSTALL_PATH = r'C:\OSGeo4W\apps\qgis'
 # --- Global variables for QGIS objects ---
 qgs_app = None
 processing = None
-QgsVectorLayer, QgsRasterLayer, QgsSingleBandPseudoColorRenderer = (None, None, None)
-QgsColorRampShader, QgsStyle, QgsProcessingException, QgsRasterShader = (None, None, None, None)
-QgsApplication = None
+qc = None  # The qgis.core module, bound by init_qgis_app_standalone()
 
 
 def init_qgis_app_standalone(qgis_install_path):
     """Initializes a QGIS application and imports all necessary modules."""
     
-    global qgs_app, processing, QgsApplication
-    global QgsVectorLayer, QgsRasterLayer, QgsSingleBandPseudoColorRenderer
-    global QgsColorRampShader, QgsStyle, QgsProcessingException, QgsRasterShader
+    global qgs_app, processing, qc
     
-    from qgis.core import QgsApplication
-    qgs_app = QgsApplication([], False)
+    import qgis.core as qc
+    qgs_app = qc.QgsApplication([], False)
 
-    QgsApplication.setPrefixPath(qgis_install_path, True)
-    print(f"QGIS prefix path set to: {QgsApplication.prefixPath()}")
+    qc.QgsApplication.setPrefixPath(qgis_install_path, True)
+    print(f"QGIS prefix path set to: {qc.QgsApplication.prefixPath()}")
 
     plugins_path = os.path.join(qgis_install_path, 'python', 'plugins')
     if plugins_path not in sys.path:
@@ -51,12 +49,7 @@ def init_qgis_app_standalone(qgis_install_path):
         print(f"\nCRITICAL ERROR: Could not import the 'processing' module. Details: {e}")
         sys.exit(1)
 
-    from qgis.core import (
-        QgsVectorLayer, QgsRasterLayer, QgsSingleBandPseudoColorRenderer,
-        QgsColorRampShader, QgsStyle, QgsProcessingException, QgsRasterShader
-    )
-    
-    alg_count = len(QgsApplication.processingRegistry().algorithms())
+    alg_count = len(qc.QgsApplication.processingRegistry().algorithms())
     
     if alg_count == 0:
         print("\nCRITICAL ERROR: No processing algorithms were loaded.")
@@ -74,35 +67,91 @@ def get_subdirectories(parent_dir):
     print(f"Found {len(subdirs)} subdirectories to process in '{parent_dir}'.")
     return subdirs
 
+def _scan_geojson_files(folder_path):
+    """Recursively yields GeoJSON and GeoJSONSeq file paths, using scandir's cached entry types."""
+    try:
+        entries = os.scandir(folder_path)
+    except OSError as e:
+        # Like os.walk, skip folders that cannot be listed instead of aborting the run.
+        print(f"  -> Warning: Could not read folder, skipping: {folder_path} ({e})")
+        return
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _scan_geojson_files(entry.path)
+            elif entry.name.lower().endswith(('.geojson', '.geojsonl')) and entry.is_file():
+                yield entry.path
+
 def find_geojson_files(folder_path):
-    geojson_files = []
-    for root, _, files in os.walk(folder_path):
-        for file in files:
-            if file.lower().endswith('.geojson'):
-                geojson_files.append(os.path.join(root, file))
-    return geojson_files
-
-def merge_geojson_to_memory_layer(geojson_files):
+    return list(_scan_geojson_files(folder_path))
+
+def open_vrt_source(f_path):
+    """
+    Opens a GeoJSON file as an OGR layer, as the memory-layer merge used to, and
+    returns its (SrcDataSource, SrcLayer) pair for the VRT, or None if it cannot be used.
+    """
+    layer = qc.QgsVectorLayer(f_path, os.path.basename(f_path), "ogr")
+    if not layer.isValid():
+        print(f"  -> Warning: Could not load GeoJSON, skipping: {f_path}")
+        return None
+    # The heatmap algorithm only takes points, and the old Point memory layer
+    # never accepted other geometries, so e.g. LineString track files stay out.
+    if layer.geometryType() != qc.QgsWkbTypes.PointGeometry:
+        print(f"  -> Warning: Not a point layer, skipping: {f_path}")
+        return None
+    # Take the layer name OGR actually reports; fall back to the file name without
+    # its extension, which is what the GeoJSON drivers normally use.
+    src_layer = os.path.splitext(os.path.basename(f_path))[0]
+    sublayers = layer.dataProvider().subLayers()
+    if sublayers:
+        src_layer = sublayers[0].split(qc.QgsDataProvider.sublayerSeparator())[1]
+    src_path = os.path.abspath(f_path)
+    if f_path.lower().endswith('.geojsonl'):
+        # Force the GeoJSONSeq driver so OGR streams the records one line at a time.
+        src_path = f"GeoJSONSeq:{src_path}"
+    return src_path, src_layer
+
+def write_vrt_union(sources, vrt_path):
+    """Writes an OGR VRT file that presents all (SrcDataSource, SrcLayer) sources as a single union layer."""
+    layers = []
+    for i, (src_path, src_layer) in enumerate(sources):
+        layers.append(
+            f'    <OGRVRTLayer name="part{i}">\n'
+            f'      <SrcDataSource relativeToVRT="0">{escape(src_path)}</SrcDataSource>\n'
+            f'      <SrcLayer>{escape(src_layer)}</SrcLayer>\n'
+            f'    </OGRVRTLayer>\n'
+        )
+    with open(vrt_path, 'w', encoding='utf-8') as f:
+        f.write('<OGRVRTDataSource>\n  <OGRVRTUnionLayer name="merged">\n')
+        f.writelines(layers)
+        f.write('  </OGRVRTUnionLayer>\n</OGRVRTDataSource>\n')
+
+def build_merged_layer(geojson_files, vrt_path):
+    """
+    Merges the GeoJSON files into one virtual OGR layer instead of copying
+    every feature into a memory layer. The heatmap algorithm then streams
+    the features straight from the files, without any Python-side loop.
+    Files that OGR cannot open, or that do not hold points, are skipped.
+    """
     if not geojson_files: return None
-    first_layer = QgsVectorLayer(geojson_files[0], "temp_first", "ogr")
-    if not first_layer.isValid():
-        print(f"Error: Could not load first GeoJSON: {geojson_files[0]}")
+    sources = []
+    for f_path in geojson_files:
+        source = open_vrt_source(f_path)
+        if source is not None:
+            sources.append(source)
+    if not sources:
+        print("Error: None of the GeoJSON files could be loaded as point layers.")
+        return None
+    write_vrt_union(sources, vrt_path)
+    merged_layer = qc.QgsVectorLayer(vrt_path, "merged_points", "ogr")
+    if not merged_layer.isValid():
+        print(f"Error: Could not load the merged virtual layer: {vrt_path}")
         return None
-    target_crs = first_layer.crs()
+    target_crs = merged_layer.crs()
     print(f"  -> Using CRS: {target_crs.authid()}")
     if target_crs.isGeographic():
         print("  -> WARNING: Data is in Geographic CRS (lat/lon). Radius/pixel size are in degrees.")
-    merged_layer = QgsVectorLayer(f"Point?crs={target_crs.authid()}", "merged_points", "memory")
-    provider = merged_layer.dataProvider()
-    merged_layer.startEditing()
-    total_features = 0
-    for f_path in geojson_files:
-        layer = QgsVectorLayer(f_path, os.path.basename(f_path), "ogr")
-        if not layer.isValid(): continue
-        for feature in layer.getFeatures(): provider.addFeature(feature); total_features += 1
-    merged_layer.commitChanges()
-    merged_layer.updateExtents()
-    print(f"  -> Merged {total_features} features from {len(geojson_files)} file(s).")
+    print(f"  -> Merged {len(sources)} of {len(geojson_files)} file(s) into a virtual layer.")
     return merged_layer
 
 def create_heatmap(input_layer, output_path, radius, pixel_size):
@@ -134,7 +183,7 @@ def create_heatmap(input_layer, output_path, radius, pixel_size):
 def style_raster_layer(raster_path, colormap_name):
     """Applies a pseudocolor style using a low-level, compatible method."""
     print(f"  -> Applying '{colormap_name}' colormap and saving style...")
-    layer = QgsRasterLayer(raster_path, os.path.basename(raster_path))
+    layer = qc.QgsRasterLayer(raster_path, os.path.basename(raster_path))
     if not layer.isValid():
         print("  -> Error: Failed to load the generated heatmap raster for styling.")
         return
@@ -147,17 +196,17 @@ def style_raster_layer(raster_path, colormap_name):
     min_val = stats.minimumValue
     max_val = stats.maximumValue
 
-    style = QgsStyle.defaultStyle()
+    style = qc.QgsStyle.defaultStyle()
     if colormap_name not in style.colorRampNames():
         print(f"  -> Warning: Color ramp '{colormap_name}' not found. Skipping styling.")
         return
     color_ramp = style.colorRamp(colormap_name)
     
-    shader_function = QgsColorRampShader(min_val, max_val, color_ramp, QgsColorRampShader.Interpolated)
-    raster_shader = QgsRasterShader()
+    shader_function = qc.QgsColorRampShader(min_val, max_val, color_ramp, qc.QgsColorRampShader.Interpolated)
+    raster_shader = qc.QgsRasterShader()
     raster_shader.setRasterShaderFunction(shader_function)
     
-    renderer = QgsSingleBandPseudoColorRenderer(provider, 1, raster_shader)
+    renderer = qc.QgsSingleBandPseudoColorRenderer(provider, 1, raster_shader)
     
     layer.setRenderer(renderer)
 
@@ -180,9 +229,14 @@ def main(args):
         output_tif_path = os.path.join(output_dir, f"{folder_name}_heatmap.tif")
         geojson_files = find_geojson_files(subdir_path)
         if not geojson_files: print(f"  -> No GeoJSON files found. Skipping."); continue
-        merged_layer = merge_geojson_to_memory_layer(geojson_files)
-        if not merged_layer: print(f"  -> Failed to merge GeoJSONs. Skipping."); continue
-        heatmap_path = create_heatmap(merged_layer, output_tif_path, args.radius, args.pixel_size)
+        # A leftover lock on the VRT must not abort the run (Windows cannot delete open files).
+        with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp_dir:
+            vrt_path = os.path.join(tmp_dir, "merged.vrt")
+            merged_layer = build_merged_layer(geojson_files, vrt_path)
+            if not merged_layer: print(f"  -> Failed to merge GeoJSONs. Skipping."); continue
+            heatmap_path = create_heatmap(vrt_path, output_tif_path, args.radius, args.pixel_size)
+            # Release the OGR handle so the temporary VRT can be removed (required on Windows).
+            del merged_layer
         if heatmap_path and os.path.exists(heatmap_path):
             style_raster_layer(heatmap_path, COLORMAP_NAME)
         else:
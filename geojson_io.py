@@ -0,0 +1,508 @@
+"""
+Shared JSON reading, GeoJSON writing and directory driver used by
+convert_to_geojson.py and convert_to_multipoint.py.
+
+The converters only differ in how they turn the parsed "items" of an input
+file into GeoJSON features; everything else lives here.
+"""
+
+import os
+import json
+import argparse
+import sys
+import mmap
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:
+    # orjson is optional; the standard library parser is used as a fallback.
+    orjson = None
+
+# Shared user properties for items without any user metadata. It is only ever
+# merged into new dicts, never modified, so one instance serves every such item.
+_ANONYMOUS_USER = {"userId": None, "ageGroup": None, "countryCode": None, "gender": None}
+
+
+def loads(buf):
+    """
+    Parses a JSON document from raw bytes, using orjson when it is available.
+    Both parsers decode UTF-8 themselves, which skips building an intermediate
+    str copy of the whole document.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(buf)
+        except orjson.JSONDecodeError as e:
+            # orjson rejects the NaN/Infinity literals the json module accepts, so
+            # retry with json to read the same files whether or not orjson is installed.
+            try:
+                return json.loads(bytes(buf))
+            except ValueError:
+                raise e from None
+    return json.loads(buf)
+
+
+def parse_json(buf, marker=None):
+    """Parses a JSON buffer, returning None without parsing if `marker` does not occur in it."""
+    if marker is not None and marker not in buf:
+        return None
+    return loads(buf)
+
+
+def read_json(input_path, marker=None):
+    """
+    Reads and parses a JSON file. With orjson the file is memory-mapped and
+    parsed straight from the mapping, so it is never copied into a bytes object.
+
+    If `marker` is given and the raw file does not contain it, the file is not
+    parsed at all and None is returned. A byte scan is far cheaper than
+    building the whole document just to find nothing of interest in it, but
+    it also means such a file is skipped without being validated as JSON.
+    """
+    with open(input_path, 'rb') as f:
+        if orjson is None or os.fstat(f.fileno()).st_size == 0:
+            # json cannot parse from a buffer, and empty files cannot be mapped.
+            return parse_json(f.read(), marker)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if marker is not None and mm.find(marker) == -1:
+                return None
+            with memoryview(mm) as view:
+                return loads(view)
+
+
+def dumps(obj, pretty=False):
+    """
+    Serializes an object to JSON bytes, using orjson when it is available.
+    Output is compact unless `pretty` is set, in which case it is indented.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(obj, indent=2).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def _indent(data, prefix):
+    """Prefixes every line of a pretty-printed JSON value, to nest it in an enclosing document."""
+    return prefix + data.replace(b'\n', b'\n' + prefix)
+
+
+def write_feature_collection(output_path, features, pretty=False, ndjson=False, summaries=None):
+    """
+    Streams features into a GeoJSON FeatureCollection file one at a time, so
+    the whole collection never has to be held in memory. The output file is
+    only created once the first feature arrives.
+
+    The data goes to a temporary file beside the output, which replaces the
+    output only once it is complete. If `features` or a write raises, the
+    temporary file is removed and no truncated output is left behind.
+
+    With `ndjson`, the features are instead written one per line with no
+    enclosing collection (newline-delimited GeoJSON, a.k.a. GeoJSONSeq).
+
+    If `summaries` is given, it is written after the features as a top-level
+    "summaries" member. It may still be filled while `features` is consumed.
+
+    Args:
+        output_path (str): The full path for the output GeoJSON file.
+        features (iterable): The GeoJSON features to write.
+        pretty (bool): Write indented, human-readable JSON instead of compact JSON.
+        ndjson (bool): Write newline-delimited GeoJSON; `pretty` is ignored.
+        summaries (dict, optional): Track summaries keyed by track ID. Not
+            supported together with `ndjson`.
+
+    Returns:
+        int: The number of features written.
+
+    Raises:
+        ValueError: If both `ndjson` and `summaries` are given.
+    """
+    if ndjson and summaries is not None:
+        raise ValueError("summaries cannot be written to newline-delimited GeoJSON")
+    if ndjson:
+        header, separator, footer = b'', b'\n', b'\n'
+        pretty = False
+    elif pretty:
+        header, separator, footer = b'{\n  "type": "FeatureCollection",\n  "features": [\n', b',\n', b'\n  ]\n}\n'
+    else:
+        header, separator, footer = b'{"type":"FeatureCollection","features":[', b',', b']}'
+
+    tmp_path = f"{output_path}.tmp"
+    count = 0
+    f = None
+    try:
+        for feature in features:
+            if f is None:
+                f = open(tmp_path, 'wb')
+                f.write(header)
+            else:
+                f.write(separator)
+            f.write(_indent(dumps(feature, True), b'    ') if pretty else dumps(feature))
+            count += 1
+        if f is not None:
+            if summaries:
+                f.write(b'\n  ],\n  "summaries": ' if pretty else b'],"summaries":')
+                f.write(dumps(summaries, True).replace(b'\n', b'\n  ') if pretty else dumps(summaries))
+                f.write(b'\n}\n' if pretty else b'}')
+            else:
+                f.write(footer)
+            f.close()
+            os.replace(tmp_path, output_path)
+    except BaseException:
+        if f is not None:
+            f.close()
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        raise
+    return count
+
+
+def load_items(input_path, marker=None, label="features", prefetched=None, report=print):
+    """
+    Reads a JSON file and returns its "items" list, or None if the file
+    cannot be used. Problems are reported as they are found.
+
+    Args:
+        input_path (str): The full path to the input JSON file.
+        marker (bytes, optional): A token every convertible file contains; files
+            without it are skipped without being parsed.
+        label (str): What the converter looks for, used in messages.
+        prefetched (Future, optional): A future holding the file's bytes, which
+            are parsed instead of reading the file again.
+        report (callable): Receives each message about the file.
+    """
+    try:
+        if prefetched is not None:
+            data = parse_json(prefetched.result(), marker)
+        else:
+            data = read_json(input_path, marker)
+    except json.JSONDecodeError:
+        # orjson.JSONDecodeError is a subclass, so this covers both parsers.
+        report(f"Error: Invalid JSON in file {input_path}")
+        return None
+    except FileNotFoundError:
+        report(f"Error: Input file not found at {input_path}")
+        return None
+    except OSError as e:
+        report(f"Error: Could not read input file {input_path}. Reason: {e}")
+        return None
+
+    if data is None:
+        # The file was skipped by the byte scan, so it was never checked for being valid JSON.
+        report(f"Info: No {label} found in {input_path} (file was not parsed or validated). Skipping file.")
+        return None
+    if not isinstance(data, dict):
+        report(f"Warning: {input_path} does not hold a JSON object. Skipping file.")
+        return None
+
+    # The top-level key is "items", which is a list.
+    # Using .get() is safer than direct access in case the key is missing.
+    items = data.get("items", [])
+    if not isinstance(items, list):
+        report(f"Warning: 'items' key in {input_path} is not a list. Skipping file.")
+        return None
+    if not items:
+        report(f"Info: No items found in {input_path}. Skipping file.")
+        return None
+
+    return items
+
+
+def user_properties(item):
+    """Returns the user metadata of an input item as feature properties."""
+    # Bind the lookup once; it is used for every user field.
+    ig = item.get
+    user_id = ig("userId")
+    age_group, country_code, gender = ig("ageGroup"), ig("countryCode"), ig("gender")
+    if user_id is None and age_group is None and country_code is None and gender is None:
+        return _ANONYMOUS_USER
+    return {
+        "userId": user_id,
+        "ageGroup": age_group,
+        "countryCode": country_code,
+        "gender": gender
+    }
+
+
+def split_summary(track_metadata, summaries):
+    """
+    If `summaries` is given, replaces the "summary" in a track's metadata with a
+    "summaryRef" to it and returns (summary_ref, summary); otherwise, or for
+    tracks without an ID, the metadata is left alone and (None, None) returned.
+
+    The summary is not recorded here but by add_summary(), once the track
+    actually yields a feature.
+    """
+    if summaries is None or track_metadata["trackId"] is None:
+        return None, None
+    # Keep one copy of the (often large) summary at the top level of the output.
+    summary_ref = str(track_metadata["trackId"])
+    summary = track_metadata.pop("summary")
+    track_metadata["summaryRef"] = summary_ref
+    return summary_ref, summary
+
+
+def add_summary(summaries, summary_ref, summary, input_path, report=print):
+    """
+    Records a track summary under its reference. Track IDs are keyed as strings,
+    so two tracks whose IDs collide (e.g. 1 and "1", or a repeated ID across
+    combined files) share a reference; if their summaries differ, a warning is
+    reported and the first summary is kept.
+    """
+    existing = summaries.setdefault(summary_ref, summary)
+    if existing is not summary and existing != summary:
+        report(f"Warning: Summary reference '{summary_ref}' in {input_path} is already used by a track "
+               f"with a different summary. Keeping the first summary.")
+
+
+def convert_file(input_path, output_path, iter_features, marker=None, label="features",
+                 pretty=False, ndjson=False, summary_refs=False, report=print):
+    """
+    Converts a single JSON file to GeoJSON.
+
+    Args:
+        input_path (str): The full path to the input JSON file.
+        output_path (str): The full path for the output GeoJSON file.
+        iter_features (callable): The converter's feature generator, called as
+            iter_features(items, input_path, summaries, report).
+        marker (bytes, optional): See load_items().
+        label (str): What the converter looks for, used in messages.
+        pretty (bool): Write indented, human-readable JSON instead of compact JSON.
+        ndjson (bool): Write newline-delimited GeoJSON, one feature per line.
+        summary_refs (bool): Write each track summary once in a top-level "summaries"
+            map and reference it from the features. Not supported with `ndjson`.
+        report (callable): Receives each message about the file.
+
+    Returns:
+        bool: True if conversion was successful, False otherwise.
+    """
+    items = load_items(input_path, marker, label, report=report)
+    if items is None:
+        return False
+
+    # Features are written as they are produced rather than collected first.
+    try:
+        summaries = {} if summary_refs else None
+        written = write_feature_collection(output_path, iter_features(items, input_path, summaries, report), pretty, ndjson, summaries)
+    except OSError as e:
+        report(f"Error: Could not write to output file {output_path}. Reason: {e}")
+        return False
+
+    if not written:
+        report(f"Info: No valid {label} found in {input_path}. No output file will be created.")
+        return False
+
+    return True
+
+
+def _convert_file_in_worker(*args):
+    """
+    Runs convert_file() in a worker process and returns (converted, messages),
+    so the parent can print each file's messages together with its result.
+    """
+    messages = []
+    converted = convert_file(*args, report=messages.append)
+    return converted, messages
+
+
+def prefetch_files(input_paths):
+    """
+    Yields (input_path, future) pairs, where each future reads the file's bytes
+    in a background thread. Reading stays one file ahead, so the I/O for the
+    next file overlaps with parsing and writing the current one.
+    """
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = None
+        for input_path in input_paths:
+            future = pool.submit(Path(input_path).read_bytes)
+            if pending is not None:
+                yield pending
+            pending = (input_path, future)
+        if pending is not None:
+            yield pending
+
+
+def _iter_combined_features(input_paths, iter_features, marker, label, summaries=None, converted=None):
+    """
+    Yields the converted features of every input file in turn, skipping unusable
+    files. Files that contributed at least one feature are appended to `converted`.
+    """
+    for input_path, prefetched in prefetch_files(input_paths):
+        items = load_items(input_path, marker, label, prefetched)
+        if items is None:
+            continue
+        count = 0
+        for feature in iter_features(items, input_path, summaries):
+            count += 1
+            yield feature
+        if count:
+            if converted is not None:
+                converted.append(input_path)
+        else:
+            print(f"Info: No valid {label} found in {input_path}. Skipping file.")
+
+
+def convert_directory(input_dir, output_dir, iter_features, marker=None, label="features",
+                      output_suffix=".geojson", workers=None, pretty=False, combine=False,
+                      ndjson=False, summary_refs=False):
+    """
+    Finds all .json files in an input directory, converts them to GeoJSON,
+    and saves them in the output directory.
+
+    Args:
+        input_dir (str): Path to the directory containing source JSON files.
+        output_dir (str): Path to the directory where GeoJSON files will be saved.
+        iter_features (callable): The converter's feature generator; see convert_file().
+        marker (bytes, optional): See load_items().
+        label (str): What the converter looks for, used in messages.
+        output_suffix (str): Appended to each input base name to form its output
+            file name; the combined output is named "combined" + output_suffix.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        pretty (bool): Write indented, human-readable JSON instead of compact JSON.
+        combine (bool): Write all features into one combined GeoJSON file.
+        ndjson (bool): Write newline-delimited GeoJSON to '.geojsonl' files.
+        summary_refs (bool): Write track summaries once in a top-level "summaries" map.
+    """
+    if not os.path.isdir(input_dir):
+        print(f"Error: Input directory '{input_dir}' not found.")
+        sys.exit(1)
+
+    # Create the output directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"Output will be saved in: {os.path.abspath(output_dir)}")
+
+    # scandir yields entries with their path and cached file type, which
+    # avoids extra stat calls and path joins for every directory entry.
+    input_files = []
+    with os.scandir(input_dir) as entries:
+        for entry in entries:
+            if entry.name.lower().endswith(".json") and entry.is_file():
+                input_files.append((entry.name, entry.path))
+    file_count = len(input_files)
+
+    # Newline-delimited output gets the conventional GeoJSONSeq extension.
+    extension = "l" if ndjson else ""
+
+    if combine:
+        # All features go into a single streamed FeatureCollection, which avoids
+        # creating and flushing one output file per (often small) input file.
+        output_filename = f"combined{output_suffix}{extension}"
+        output_filepath = os.path.join(output_dir, output_filename)
+        print(f"Combining {file_count} file(s) into '{output_filename}'...")
+        input_paths = [input_filepath for _, input_filepath in input_files]
+        summaries = {} if summary_refs else None
+        converted = []
+        features = _iter_combined_features(input_paths, iter_features, marker, label, summaries, converted)
+        # Input files that cannot be read are reported and skipped inside the
+        # generator, so an OSError here comes from writing the output.
+        try:
+            written = write_feature_collection(output_filepath, features, pretty, ndjson, summaries)
+        except OSError as e:
+            print(f"Error: Could not write to output file {output_filepath}. Reason: {e}")
+            written = 0
+            converted = []
+
+        print("\n--- Conversion Summary ---")
+        print(f"Total .json files found: {file_count}")
+        print(f"Files with features written: {len(converted)}")
+        print(f"Failed or skipped: {file_count - len(converted)}")
+        print(f"Features written: {written}")
+        if not written:
+            print("No output file was created.")
+        print("--------------------------")
+        return
+
+    success_count = 0
+
+    # Each file is independent, so they are converted in parallel worker
+    # processes. Workers collect their messages instead of printing them, and
+    # this process prints each file's messages with its result as it completes.
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        jobs = {}
+        for filename, input_filepath in input_files:
+            # Create a corresponding output filename
+            base_name = os.path.splitext(filename)[0]
+            output_filename = f"{base_name}{output_suffix}{extension}"
+            output_filepath = os.path.join(output_dir, output_filename)
+
+            future = executor.submit(_convert_file_in_worker, input_filepath, output_filepath, iter_features,
+                                     marker, label, pretty, ndjson, summary_refs)
+            jobs[future] = (filename, output_filename)
+
+        print(f"Processing {file_count} file(s)...")
+
+        for future in as_completed(jobs):
+            filename, output_filename = jobs[future]
+            try:
+                converted, messages = future.result()
+            except Exception as e:
+                converted, messages = False, [f"Error: Unexpected failure while processing '{filename}'. Reason: {e}"]
+
+            for message in messages:
+                print(message)
+
+            if converted:
+                print(f"Successfully converted '{filename}' to '{output_filename}'")
+                success_count += 1
+            else:
+                print(f"Failed to convert '{filename}'")
+
+    print("\n--- Conversion Summary ---")
+    print(f"Total .json files found: {file_count}")
+    print(f"Successfully converted: {success_count}")
+    print(f"Failed or skipped: {file_count - success_count}")
+    print("--------------------------")
+
+
+def positive_int(value):
+    """argparse type for options that must be an integer of at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def add_output_arguments(parser, combined_filename):
+    """Adds the output options shared by both converters to an argparse parser."""
+    parser.add_argument(
+        "-j", "--workers",
+        type=positive_int,
+        default=None,
+        help="Number of worker processes used to convert files in parallel.\nNot supported with --combine, which reads the files in order.\n(default: the number of CPUs)"
+    )
+    output_format = parser.add_mutually_exclusive_group()
+    output_format.add_argument(
+        "--pretty",
+        action="store_true",
+        help="Write indented, human-readable GeoJSON.\n(default: compact GeoJSON, which is smaller and faster to write)"
+    )
+    output_format.add_argument(
+        "--ndjson",
+        action="store_true",
+        help="Write newline-delimited GeoJSON (one feature per line) to '.geojsonl' files.\nThis streams well into tools such as OGR's GeoJSONSeq driver."
+    )
+    parser.add_argument(
+        "--summary-refs",
+        action="store_true",
+        help="Write each track summary once in a top-level 'summaries' map keyed by\ntrack ID, and give features a 'summaryRef' instead of a copy.\nThis extends GeoJSON and cannot be combined with --ndjson."
+    )
+    parser.add_argument(
+        "--combine",
+        action="store_true",
+        help=f"Write all features into a single '{combined_filename}'\ninstead of one output file per input file."
+    )
+
+
+def check_output_arguments(parser, args):
+    """Rejects option combinations add_output_arguments() cannot express in argparse."""
+    if args.summary_refs and args.ndjson:
+        parser.error("--summary-refs cannot be combined with --ndjson")
+    if args.workers is not None and args.combine:
+        parser.error("-j/--workers cannot be combined with --combine")